@@ -1,3 +1,4 @@
+import io
 import sys
 import numpy as np
 import time
@@ -19,18 +20,21 @@ WEATHER = "very clear" # Weather conditions
 AZIMUTH_ANGLE = "0.00" # Angle from North
 DURATION = 30 # How many seconds to collect data for 
 CALLIBRATING = None # True if calibrating, False if not, or None to prompt user 
+SAMPLE_PERIOD = 0.056 # Seconds per reading at the default resolution (measured from the captures in Data/)
+BATCH_SECONDS = 0.5 # Target length of one batched READ? query (0 disables batching)
 
-HEADER_TEMPLATE = """{0}
-Duration (in s): {6}
-Calibrating: {2}
-Temperature of the calibrator (in Celsius): {4}
-Azimuth angle from North: {1}
-Altitude angle from the horizon: {7}
-Temperature Outside (in Celsius): {3}
-Weather: {7}
-Units: {8}
+# Prebuilt progress-bar segments, sliced rather than rebuilt on every redraw
+_BAR_FULL = "#" * 128
+_BAR_EMPTY = "-" * 128
 
-Time (s), Voltage (V)"""
+_RM = None
+
+def _get_rm():
+    """Returns the shared VISA ResourceManager, creating it on first use."""
+    global _RM
+    if _RM is None:
+        _RM = pyvisa.ResourceManager()
+    return _RM
 
 # ==============================
 #       READOUT CLASS
@@ -67,11 +71,23 @@ class Readout():
             self.use_mock = use_mock
 
         if not self.use_mock:
-            self.rm = pyvisa.ResourceManager()
+            self.rm = _get_rm()
             self.multimeter = self.rm.open_resource('USB0::0x0957::0x0618::MY52210065::INSTR')
+            # Stop reads at the newline instead of waiting on end-of-message, and keep transfers small
+            self.multimeter.read_termination = '\n'
+            self.multimeter.write_termination = '\n'
+            self.multimeter.send_end = True
+            self.multimeter.chunk_size = 4096
             self.multimeter.write("CONF:VOLT:DC:RANG 1")  
+            self.binary = self.configure_format()
+            self.batch_size = self.configure_batch(max(1, int(BATCH_SECONDS / SAMPLE_PERIOD)))
+            # Allow twice the expected acquisition time of a full batch, plus 1 s for transfer
+            self.multimeter.timeout = int(1000 * (2 * self.batch_size * SAMPLE_PERIOD + 1))
         else:
             print("✅ Running in MOCK mode: No hardware connected.")
+            self.binary = False
+            # Same batch size as real hardware so the batched read path can be exercised without it
+            self.batch_size = max(1, int(BATCH_SECONDS / SAMPLE_PERIOD))
             self.azimuth_angle = np.nan  
             self.elevation_angle = np.nan  
 
@@ -99,85 +115,240 @@ class Readout():
         self.filename = os.path.join(self.data_dir, self.date + self.run_name + ".txt")
 
     def close(self):
-        """Close the connection (only applies if using real hardware)."""
+        """Close the connection (only applies if using real hardware).
+
+        The shared ResourceManager stays open for later Readout instances.
+        """
         if not self.use_mock:
-            self.rm.close()
+            self.multimeter.close()
+
+    def __enter__(self):
+        """Use the Readout as a context manager; returns itself."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the instrument session, leaving the shared ResourceManager open."""
+        self.close()
 
     def trigger(self, trigger_mode):
         """Trigger the multimeter (only applies in real mode)."""
         if not self.use_mock:
             self.multimeter.write(f"TRIG:SOUR {trigger_mode}")
 
+    def probe(self, *commands):
+        """Send SCPI commands and collect every error they queued.
+
+        The error queue is cleared first and drained afterwards, so one probe's
+        failures can't be read back by the next.
+
+        :param commands: SCPI commands to send.
+        :return: List of error strings (empty if all commands were accepted).
+        """
+        self.multimeter.write("*CLS")
+        for command in commands:
+            self.multimeter.write(command)
+        errors = []
+        for _ in range(32):  # The 34405A error queue holds at most 20 entries
+            error = self.multimeter.query("SYST:ERR?").strip()
+            if error.startswith(("+0", "0")):
+                break
+            errors.append(error)
+        return errors
+
+    def configure_format(self):
+        """Switch readings to little-endian REAL,64 binary blocks.
+
+        :return: True if binary transfer is in use, False if the instrument stays on ASCII.
+        """
+        errors = self.probe("FORM:DATA REAL,64", "FORM:BORD SWAP")
+        if errors:
+            print(f"⚠️ Binary transfer not supported ({errors[0]}), using ASCII readings.")
+            self.probe("FORM:DATA ASC")  # In case only FORM:BORD was rejected; probe drains any error
+            return False
+        return True
+
+    def configure_batch(self, n):
+        """Ask the multimeter to return n readings per READ? query.
+
+        :param n: Number of samples per trigger.
+        :return: The batch size in use, or 1 if the instrument rejected SAMP:COUN.
+        """
+        if n <= 1:
+            return 1
+        errors = self.probe(f"SAMP:COUN {n}", "TRIG:COUN 1")
+        if errors:
+            print(f"⚠️ Batch reads not supported ({errors[0]}), reading one sample per query.")
+            self.probe("SAMP:COUN 1")  # In case only TRIG:COUN was rejected; probe drains any error
+            return 1
+        self.sample_count = n
+        return n
+
     def read_loop(self):
-        """Reads from the multimeter (or mock data) for a given duration.
+        """Reads from the multimeter (or mock data) for a given duration, streaming samples to self.filename.
+
+        set_experiment_info() must be called first to set the duration and output filename.
 
-        :param duration: Duration in seconds for data collection.
         :return: NumPy array with time (s) and voltage (V).
         """
+        if self.filename is None:
+            raise RuntimeError("No output file set; call set_experiment_info() before read_loop().")
+
         if not self.use_mock:
             self.trigger("IMM")  
 
-        data = []
-        t = []
-        start_time = time.time()
-        last_update = start_time
-
-        self.prefix = f"Reading Data for {self.duration} s:"
-        self.printProgress(0, self.duration, prefix=self.prefix, suffix="Complete", barLength=50)
+        # Preallocate (time, voltage) rows; grown geometrically if the meter outpaces the estimate
+        cap = max(256, int(self.duration * 12))
+        buf = np.empty((cap, 2), dtype=np.float64)
+        i = 0
 
-        while True:
-            elapsed_time = time.time() - start_time
+        def _grow(buf):
+            return np.resize(buf, (buf.shape[0] * 2, 2))
 
-            if elapsed_time >= self.duration:
-                break  
+        ramp = np.arange(self.batch_size, dtype=np.float64)
 
-            if time.time() - last_update >= 0.1:
-                self.printProgress(elapsed_time, self.duration, prefix=self.prefix, suffix="Complete", barLength=50)
-                last_update = time.time()
+        # Integer monotonic clock: immune to wall-clock jumps and cheaper to compare
+        _t = time.monotonic_ns
+        start_time = _t()
+        deadline = start_time + int(self.duration * 1_000_000_000)
+        next_ui = start_time
+        next_flush = start_time + 1_000_000_000
 
-            t.append(elapsed_time)
-            data.append(self.read())
+        self.prefix = f"Reading Data for {self.duration} s:"
+        duration = self.duration
+        printProgress = self.printProgress
+        prefix, barLength = self.prefix, 50
+        printProgress(0, duration, prefix=prefix, suffix="Complete", barLength=barLength)
+
+        # Stream rows to disk as they arrive so a crash mid-run keeps the partial capture
+        with open(self.filename, "wb", buffering=1 << 20) as out:
+            out.write((self._build_header() + "\n").encode())
+
+            while True:
+                now = _t()
+                if now >= deadline:
+                    break
+                elapsed_time = (now - start_time) * 1e-9
+
+                if now >= next_ui:
+                    printProgress(elapsed_time, duration, prefix=prefix, suffix="Complete", barLength=barLength)
+                    next_ui = now + 250_000_000
+
+                # Push buffered rows to the OS about once a second so a killed run loses at most that much
+                if now >= next_flush:
+                    out.flush()
+                    next_flush = now + 1_000_000_000
+
+                while i + self.batch_size > buf.shape[0]:
+                    buf = _grow(buf)
+                # Timestamp right before the query so progress and flush time isn't counted as sampling time
+                batch_start = _t()
+                elapsed_time = (batch_start - start_time) * 1e-9
+                if self.batch_size > 1:
+                    # One query returns a block of samples; spread their timestamps over the query time.
+                    # The last block is clipped so the run doesn't overshoot the requested duration.
+                    remaining = (deadline - batch_start) * 1e-9
+                    k = min(self.batch_size, max(1, int(remaining / SAMPLE_PERIOD)))
+                    chunk = self.read_batch(k)
+                    n = len(chunk)
+                    if not 1 <= n <= k:
+                        raise RuntimeError(f"Multimeter returned {n} readings for a {k}-sample batch.")
+                    dt = (_t() - batch_start) * 1e-9 / n
+                    # Fill the time column in place rather than building a temporary array
+                    np.multiply(ramp[:n], dt, out=buf[i:i + n, 0])
+                    buf[i:i + n, 0] += elapsed_time
+                    buf[i:i + n, 1] = chunk
+                    out.write(b"".join([b"%.6f,%.6g\n" % (t, v) for t, v in buf[i:i + n].tolist()]))
+                    i += n
+                else:
+                    buf[i, 0] = elapsed_time
+                    buf[i, 1] = self.read()
+                    out.write(b"%.6f,%.6g\n" % (elapsed_time, buf[i, 1]))
+                    i += 1
 
-        self.printProgress(self.duration, self.duration, prefix=self.prefix, suffix="Complete", barLength=50)
+        printProgress(duration, duration, prefix=prefix, suffix="Complete", barLength=barLength)
+        print(f"✅ Data saved to {self.filename}")
 
         if not self.use_mock:
-            self.trigger("BUS")  
+            self.trigger("BUS")
 
-        return np.column_stack((t, data))
+        return buf[:i]
 
     def read(self):
         """Reads voltage data from the multimeter (or generates mock data)."""
         if self.use_mock:
             time.sleep(0.1)
             return np.random.uniform(0, 5)  
+        elif self.binary:
+            return self.multimeter.query_binary_values("READ?", datatype='d', is_big_endian=False, container=np.ndarray)[0]
         else:
             return self.multimeter.query_ascii_values("READ?")[0]
 
+    def read_batch(self, n):
+        """Reads a block of n voltage samples with a single query (or generates mock data).
+
+        :param n: Number of samples; SAMP:COUN is updated if it differs from the last batch.
+        :return: NumPy array of voltages (V).
+        """
+        if self.use_mock:
+            time.sleep(SAMPLE_PERIOD * n)
+            return np.random.uniform(0, 5, n)
+        if n != self.sample_count:
+            self.multimeter.write(f"SAMP:COUN {n}")
+            self.sample_count = n
+        if self.binary:
+            return self.multimeter.query_binary_values("READ?", datatype='d', is_big_endian=False, container=np.ndarray)
+        else:
+            return self.multimeter.query_ascii_values("READ?", container=np.ndarray)
+
+    def _build_header(self):
+        """Builds the metadata header written above the data columns."""
+        return (
+            f"{self.filename}\n"
+            f"Duration (in s): {self.duration}\n"
+            f"Calibrating: {self.calibrating}\n"
+            f"Temperature of the calibrator (in Celsius): {self.temperatureCalibrator}\n"
+            f"Azimuth angle from North: {self.azimuth_angle}\n"
+            f"Altitude angle from the horizon: {self.elevation_angle}\n"
+            f"Temperature Outside (in Celsius): {self.temperatureOutside}\n"
+            f"Weather: {self.weather}\n"
+            f"Units: {self.units}\n"
+            f"\n"
+            f"Time (s), Voltage (V)"
+        )
+
     def save_data(self, data):
         """Saves the collected data to a CSV or TXT file.
 
         :param data: NumPy array with columns (time, voltage).
         """
-        header = HEADER_TEMPLATE.format(
-            self.filename, self.azimuth_angle, self.calibrating, 
-            self.temperatureOutside, self.temperatureCalibrator, self.weather, 
-            self.duration, self.elevation_angle, self.units
-        )
-
-        np.savetxt(self.filename, data, header=header, delimiter=",", comments="")
+        header = self._build_header()
+
+        # Format into memory and write the file in one call rather than line by line
+        buf = io.BytesIO()
+        np.savetxt(buf, data, fmt=("%.6f", "%.6g"), header=header, delimiter=",", comments="")
+        with open(self.filename, "wb") as f:
+            f.write(buf.getvalue())
+        self.save_npy(data)
         print(f"✅ Data saved to {self.filename}")
 
+    def save_npy(self, data):
+        """Writes a binary sidecar so analysis can memory-map the samples instead of parsing text.
+
+        :param data: NumPy array with columns (time, voltage).
+        """
+        np.save(os.path.splitext(self.filename)[0] + ".npy", data)
+
     @staticmethod
     def printProgress(iteration, total, prefix='', suffix='', decimals=1, barLength=50):
         """Displays a terminal progress bar."""
         if total == 0:
             return  
         
-        percent = f"{100 * (iteration / total):.{decimals}f}"
+        barLength = min(barLength, len(_BAR_FULL))
         filled_length = int(barLength * iteration / total)
-        bar = "#" * filled_length + "-" * (barLength - filled_length)
+        bar = _BAR_FULL[:filled_length] + _BAR_EMPTY[:barLength - filled_length]
 
-        sys.stdout.write(f"\r{prefix} |{bar}| {percent}% {suffix}")
+        sys.stdout.write("\r%s |%s| %.*f%% %s" % (prefix, bar, decimals, 100 * (iteration / total), suffix))
         sys.stdout.flush()
 
         if iteration >= total:
@@ -188,11 +359,11 @@ class Readout():
 #        MAIN EXECUTION
 # ==============================
 if __name__ == "__main__":
-    multimeter = Readout()
-    multimeter.set_experiment_info()  
+    with Readout() as multimeter:
+        multimeter.set_experiment_info()  
 
-    data = multimeter.read_loop()  
+        data = multimeter.read_loop()  
 
-    multimeter.save_data(data)  
+        multimeter.save_npy(data)  
 
     print('\a')  
@@ -1,28 +1,72 @@
 import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit
+
+# Older captures record the horn angle from the horizontal (90 = horizon, 180 = zenith);
+# Readout.py records the altitude above the horizon directly
+_ANGLE_RE = re.compile(r"Angle pointing \(from horizontal parallel to supporting axis\):\s*(\S+)")
+_ALTITUDE_RE = re.compile(r"Altitude angle from the horizon:\s*(\S+)")
+# A complete (time, voltage) row, whitespace- or comma-separated; captures the voltage.
+# Header, comment and truncated rows don't match and are skipped.
+_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+_ROW_RE = re.compile(rf"^[ \t]*{_NUMBER}[ \t]*[, \t][ \t]*({_NUMBER})[ \t]*\r?$", re.M)
 
 def read_data_file(filename):
-    """Reads a single data file and extracts the angle and voltage values."""
-    angle = None
-    voltage_values = []
-    
+    """Reads a single data file and extracts the altitude angle (degrees above the horizon) and mean voltage."""
+    # Prefer the binary sidecar written by Readout over reparsing the text, unless the text was edited since
+    npy_path = os.path.splitext(filename)[0] + ".npy"
+    use_npy = os.path.exists(npy_path) and os.path.getmtime(npy_path) >= os.path.getmtime(filename)
+
     with open(filename, 'r') as f:
+        # Only the header is needed for the angle: stop at the column titles or the first data row
+        header = []
+        first_row = ""
         for line in f:
-            line = line.strip()
-            if line.startswith("#"):
-                if "Angle pointing (from horizontal parallel to supporting axis):" in line:
-                    angle = float(line.split(":")[1].strip())
-            elif line:
-                parts = line.split()
-                if len(parts) >= 2:
-                    voltage_values.append(float(parts[1]))
-    
-    if angle is None:
-        raise ValueError(f"Could not find angle in file: {filename}")
+            if _ROW_RE.match(line):
+                first_row = line
+                break
+            if line.startswith("Time (s)"):
+                break
+            header.append(line)
+        header = "".join(header)
+
+        if use_npy:
+            voltage_values = np.load(npy_path, mmap_mode='r')[:, 1]
+        else:
+            voltage_values = np.array(_ROW_RE.findall(first_row + f.read()), dtype=np.float64)
+            if voltage_values.size == 0:
+                raise ValueError(f"No data found in file: {filename}")
+
+    m = _ALTITUDE_RE.search(header)
+    if m is not None:
+        angle = float(m.group(1))
+    else:
+        m = _ANGLE_RE.search(header)
+        if m is None:
+            raise ValueError(f"Could not find angle in file: {filename}")
+        angle = float(m.group(1)) - 90
     
-    return angle, np.mean(voltage_values)
+    return angle, float(voltage_values.mean())
+
+# Below this much data, starting worker processes costs more than parsing serially
+_PARALLEL_MIN_BYTES = 64 * 2**20
+
+def read_data_files(filenames, max_workers=None):
+    """Reads several data files, returning (angle, mean voltage) per file in order.
+
+    Large sets of files are parsed in parallel processes; small ones in a plain loop.
+    """
+    if sum(os.path.getsize(f) for f in filenames) < _PARALLEL_MIN_BYTES:
+        return [read_data_file(f) for f in filenames]
+
+    workers = max_workers or os.cpu_count() or 1
+    # A few chunks per worker keeps them balanced when some captures are much longer than others
+    chunksize = max(1, len(filenames) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(read_data_file, filenames, chunksize=chunksize))
 
 def calibrate_temperature(voltage_hot, voltage_cold, T_hot, T_cold):
     """Finds the linear calibration constants (a, b) for temperature conversion."""
@@ -34,40 +78,58 @@ def convert_voltage_to_temperature(voltage, a, b):
     """Converts voltage to temperature using the calibration constants."""
     return a * voltage + b
 
-def fit_cmb_temperature(angles, temperatures):
-    """Fits the observed temperature model to estimate T_cmb."""
-    def temperature_model(sin_theta, T_cmb, T_vertical):
-        return T_cmb + T_vertical / sin_theta
+def temperature_model(sin_theta, T_cmb, T_vertical):
+    """Observed temperature as the CMB plus an atmosphere contribution scaling with airmass."""
+    return T_cmb + T_vertical / sin_theta
+
+def fit_cmb_temperature(sin_thetas, temperatures, return_cov=False):
+    """Fits the observed temperature model to estimate T_cmb.
+
+    :param sin_thetas: Sine of the pointing angle above the horizon for each measurement.
+    :param temperatures: Calibrated temperatures (K).
+    :param return_cov: If True, also return the parameter covariance matrix.
+    """
+    # The model is linear in (T_cmb, T_vertical), so solve it as ordinary least squares
+    A = np.column_stack([np.ones_like(sin_thetas), 1.0 / sin_thetas])
+    popt = np.linalg.lstsq(A, temperatures, rcond=None)[0]
+    T_cmb, T_vertical = popt
 
-    sin_thetas = np.sin(np.radians(angles))
-    popt, _ = curve_fit(temperature_model, sin_thetas, temperatures, p0=[2.7, 10])
+    if not return_cov:
+        return T_cmb, T_vertical
+
+    # pcov = s^2 (A^T A)^-1, with s^2 the residual variance (undefined without spare degrees of freedom)
+    dof = len(temperatures) - len(popt)
+    if dof > 0:
+        residuals = temperatures - A @ popt
+        pcov = (residuals @ residuals / dof) * np.linalg.inv(A.T @ A)
+    else:
+        pcov = np.full((len(popt), len(popt)), np.inf)
     
-    return popt[0], popt[1]  # T_cmb, T_vertical
+    return T_cmb, T_vertical, pcov
 
 def plot_cmb_estimate(filenames, voltage_hot, voltage_cold, T_hot=275.15, T_cold=77):
     """Reads multiple files, extracts angles and voltages, applies calibration, and fits T_cmb."""
-    angles = []
-    voltages = []
-
     for file in filenames:
         print(file)
-        angle, avg_voltage = read_data_file(file)
-        angles.append(angle-90)
-        voltages.append(avg_voltage)
+    results = read_data_files(filenames)
+
+    angles = np.array([angle for angle, _ in results], dtype=np.float64)
+    voltages = np.array([avg_voltage for _, avg_voltage in results], dtype=np.float64)
+    sin_thetas = np.sin(np.deg2rad(angles))
 
     # Calibration
     a, b = calibrate_temperature(voltage_hot, voltage_cold, T_hot, T_cold)
-    temperatures = [convert_voltage_to_temperature(v, a, b) for v in voltages]
+    temperatures = convert_voltage_to_temperature(voltages, a, b)
 
     # Fit T_cmb model
-    T_cmb, T_vertical = fit_cmb_temperature(angles, temperatures)
+    T_cmb, T_vertical, pcov = fit_cmb_temperature(sin_thetas, temperatures, return_cov=True)
+    T_cmb_err, T_vertical_err = np.sqrt(np.diag(pcov))
 
     # Plot
-    sin_thetas = np.sin(np.radians(angles))
     plt.scatter(sin_thetas, temperatures, label="Observed Data", color="blue")
     
     sin_fit = np.linspace(0.1, 1, 100)  # Avoid division by zero
-    plt.plot(sin_fit, T_cmb + T_vertical / sin_fit, 'r--', label=f"Fit: T_cmb={T_cmb:.2f}K")
+    plt.plot(sin_fit, temperature_model(sin_fit, T_cmb, T_vertical), 'r--', label=f"Fit: T_cmb={T_cmb:.2f}K")
 
     plt.xlabel(r"$\sin(\theta)$")
     plt.ylabel("Observed Temperature (K)")
@@ -76,8 +138,8 @@ def plot_cmb_estimate(filenames, voltage_hot, voltage_cold, T_hot=275.15, T_cold
     plt.grid()
     plt.show()
 
-    print(f"Estimated CMB Temperature: {T_cmb:.2f} K")
-    print(f"Estimated Vertical Temperature Contribution: {T_vertical:.2f} K")
+    print(f"Estimated CMB Temperature: {T_cmb:.2f} ± {T_cmb_err:.2f} K")
+    print(f"Estimated Vertical Temperature Contribution: {T_vertical:.2f} ± {T_vertical_err:.2f} K")
     print(f"Calibration: T = {a:.3f} * Voltage + {b:.3f}")
 
 # Example usage:
@@ -91,8 +153,8 @@ if __name__ == "__main__":
     skydip = glob.glob('Data/*sky')
     calib_hot = "Data/BW2025-02-07_15:58:23blackbody_nonitogen"  # "Data/BW2025-02-07_16:21:40calibration2"
     calib_cold = "Data/BW2025-02-07_16:01:05blackbody_withnitrogen" #"Data/BW2025-02-07_16:23:39calibration2"
-    voltage_hot = read_data_file(calib_hot)[1].mean()
-    voltage_cold = read_data_file(calib_cold)[1].mean()
+    voltage_hot = read_data_file(calib_hot)[1]
+    voltage_cold = read_data_file(calib_cold)[1]
     outside_temp = 2
     
     plot_cmb_estimate(skydip, voltage_hot, voltage_cold, T_hot=275.15+outside_temp, T_cold=77)